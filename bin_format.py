@@ -0,0 +1,16 @@
+import struct
+from functools import lru_cache
+
+# Header fields of the binary format are little-endian unsigned 32-bit ints
+U32 = struct.Struct('<I')
+
+# Zip local file header; the file name and extra field lengths are its
+# last two fields
+ZIP_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+
+@lru_cache(maxsize=8)
+def shape_struct(rank):
+    """
+    Returns a cached Struct that packs or unpacks a shape of the given rank.
+    """
+    return struct.Struct('<' + 'I' * rank)
@@ -1,39 +1,181 @@
+import io
+import mmap
 import numpy as np
+import os
 import struct
 import sys
+import time
+import zipfile
+import zlib
+from math import prod
 
-def binary_to_npz(binary_file, npz_file):
+from bin_format import U32, ZIP_LOCAL_HEADER, shape_struct
+
+# Zip central directory header and end of central directory record, as
+# written by _save_npz
+_ZIP_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_ZIP_END_RECORD = struct.Struct('<IHHHHIIH')
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+# Zip spec version 2.0 on a Unix host, so external_attr holds a file mode
+_ZIP_VERSION_MADE_BY = (3 << 8) | 20
+
+def _parse_header(buf):
     """
-    Converts a binary file with a key-index mapping back to an .npz file.
-    """    
+    Walks the metadata header in buf.
+
+    Returns the list of (key, shape, dtype, nbytes) tuples, with dtype an
+    np.dtype, and the offset at which the binary data starts. Raises
+    struct.error if buf is too short.
+    """
+    def read_str(off):
+        length = U32.unpack_from(buf, off)[0]
+        off += 4
+        if off + length > len(buf):
+            raise struct.error("header buffer too short")
+        return buf[off:off + length].decode('ascii'), off + length
+
+    _dtype = np.dtype
+    num_keys = U32.unpack_from(buf, 0)[0]
+    off = 4
+
+    metadata = []
+    for _ in range(num_keys):
+        key, off = read_str(off)
+
+        shape_length = U32.unpack_from(buf, off)[0]
+        off += 4
+        shape = shape_struct(shape_length).unpack_from(buf, off)
+        off += 4 * shape_length
+
+        dtype, off = read_str(off)
+        dtype = _dtype(dtype)
+
+        metadata.append((key, shape, dtype, prod(shape) * dtype.itemsize))
+
+    return metadata, off
+
+def _read_arrays(buf, out=None):
+    """
+    Builds the arrays described by the header in buf as zero-copy views
+    into buf, copying into the matching arrays of out where given.
+    """
+    metadata, offset = _parse_header(buf)
+    base = np.frombuffer(buf, dtype=np.uint8)
+
     data_dict = {}
+    for key, shape, dtype, nbytes in metadata:
+        array = base[offset:offset + nbytes].view(dtype).reshape(shape)
+        offset += nbytes
 
-    with open(binary_file, 'rb') as bin_file:
-        # Read number of keys
-        num_keys = struct.unpack('I', bin_file.read(4))[0]
+        # Reuse the caller's buffer if it matches
+        target = out.get(key) if out is not None else None
+        if target is not None and target.shape == shape and target.dtype == dtype:
+            np.copyto(target, array)
+            array = target
+        data_dict[key] = array
+
+    return data_dict
 
-        # Read metadata
-        metadata = []
-        for _ in range(num_keys):
-            key_length = struct.unpack('I', bin_file.read(4))[0]
-            key = bin_file.read(key_length).decode('utf-8')
+def _npy_member(key, array):
+    """
+    Returns the member name, .npy header and raw C-order payload for an
+    array.
+    """
+    if not array.flags.c_contiguous:
+        array = np.ascontiguousarray(array)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, np.lib.format.header_data_from_array_1_0(array))
+    return (key + '.npy').encode('ascii'), header.getvalue(), array.reshape(-1).view(np.uint8).data
+
+def _save_npz(npz_file, data_dict):
+    """
+    Writes the arrays to an uncompressed .npz file.
+
+    The zip records are emitted directly, with the CRC of each member taken
+    over its buffers in one pass. File objects and archives that would need
+    ZIP64 are written with zipfile instead.
+    """
+    if hasattr(npz_file, 'write'):
+        _save_npz_zipfile(npz_file, data_dict)
+        return
+
+    npz_file = os.fspath(npz_file)
+    if not npz_file.endswith('.npz'):
+        npz_file += '.npz'
+
+    members = [_npy_member(key, array) for key, array in data_dict.items()]
+    total = sum(ZIP_LOCAL_HEADER.size + len(name) + len(header) + len(payload)
+                for name, header, payload in members)
+    if total >= _ZIP32_LIMIT or len(members) >= 0xFFFF:
+        _save_npz_zipfile(npz_file, data_dict)
+        return
+
+    now = time.localtime()
+    dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+    dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
 
-            shape_length = struct.unpack('I', bin_file.read(4))[0]
-            shape = struct.unpack('I' * shape_length, bin_file.read(4 * shape_length))
+    with open(npz_file, 'wb') as raw:
+        central = []
+        offset = 0
+        for name, header, payload in members:
+            size = len(header) + len(payload)
+            crc = zlib.crc32(payload, zlib.crc32(header))
+            raw.write(ZIP_LOCAL_HEADER.pack(0x04034b50, 20, 0, zipfile.ZIP_STORED,
+                                            dos_time, dos_date, crc, size, size, len(name), 0))
+            raw.write(name)
+            raw.write(header)
+            raw.write(payload)
+            central.append(_ZIP_CENTRAL_HEADER.pack(0x02014b50, _ZIP_VERSION_MADE_BY, 20, 0,
+                                                    zipfile.ZIP_STORED, dos_time, dos_date, crc,
+                                                    size, size, len(name), 0, 0, 0, 0,
+                                                    0o600 << 16, offset) + name)
+            offset += ZIP_LOCAL_HEADER.size + len(name) + size
 
-            dtype_length = struct.unpack('I', bin_file.read(4))[0]
-            dtype = bin_file.read(dtype_length).decode('utf-8')
+        central = b''.join(central)
+        raw.write(central)
+        raw.write(_ZIP_END_RECORD.pack(0x06054b50, 0, 0, len(members), len(members),
+                                       len(central), offset, 0))
+
+def _save_npz_zipfile(npz_file, data_dict):
+    """
+    Writes the arrays to an uncompressed .npz file with zipfile, streaming
+    each member straight into the archive.
+    """
+    with zipfile.ZipFile(npz_file, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for key, array in data_dict.items():
+            with zf.open(key + '.npy', 'w', force_zip64=True) as member:
+                np.lib.format.write_array(member, array, allow_pickle=False)
+
+def binary_to_npz(binary_file, npz_file, out=None):
+    """
+    Converts a binary file with a key-index mapping back to an .npz file.
+
+    Args:
+        binary_file (str): Path to the input binary file.
+        npz_file (str or file): Path or writable file object for the output
+            .npz file.
+        out (dict, optional): Preallocated arrays by key. Arrays whose shape
+            and dtype match the file are filled in place, so repeated reads
+            of files with the same layout can reuse them.
+    """
+    with open(binary_file, 'rb') as bin_file:
+        mm = mmap.mmap(bin_file.fileno(), 0, access=mmap.ACCESS_READ)
 
-            metadata.append((key, shape, dtype))
+    try:
+        data_dict = _read_arrays(mm, out)
 
-        # Read binary data
-        for key, shape, dtype in metadata:
-            num_elements = np.prod(shape) if shape else 1
-            array = np.frombuffer(bin_file.read(num_elements * np.dtype(dtype).itemsize), dtype=dtype)
-            data_dict[key] = array.reshape(shape)
+        # Save to .npz, dropping the views before the mapping is closed
+        _save_npz(npz_file, data_dict)
+        del data_dict
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            # Views are still held by a propagating traceback; the mapping
+            # is released together with them
+            pass
 
-    # Save to .npz
-    np.savez(npz_file, **data_dict)
     print(f"Data successfully written to {npz_file}")
 
 if __name__ == "__main__":
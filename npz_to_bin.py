@@ -1,6 +1,139 @@
 import numpy as np
-import struct
+import os
 import sys
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from math import prod
+
+from bin_format import U32, ZIP_LOCAL_HEADER, shape_struct
+
+# Data types the binary format supports
+_ALLOWED_DTYPES = frozenset(np.dtype(t) for t in ('float64', 'float32', 'int32', 'uint8'))
+
+# Maximum number of buffers accepted by a single pwritev call
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+
+def _pack_header(entries):
+    """
+    Packs the metadata header into a single pre-sized buffer.
+
+    Args:
+        entries (list): (key, shape, dtype) tuples, with key and dtype
+            already encoded to bytes.
+    """
+    size = 4 + sum(4 + len(key) + 4 + 4 * len(shape) + 4 + len(dtype)
+                   for key, shape, dtype in entries)
+    header = bytearray(size)
+
+    U32.pack_into(header, 0, len(entries))  # Number of keys
+    off = 4
+    for key, shape, dtype in entries:
+        U32.pack_into(header, off, len(key))  # Key name length
+        off += 4
+        header[off:off + len(key)] = key  # Key name
+        off += len(key)
+        U32.pack_into(header, off, len(shape))  # Shape length
+        off += 4
+        shape_struct(len(shape)).pack_into(header, off, *shape)  # Shape
+        off += 4 * len(shape)
+        U32.pack_into(header, off, len(dtype))  # Data type length
+        off += 4
+        header[off:off + len(dtype)] = dtype  # Data type
+        off += len(dtype)
+
+    return header
+
+def _pwritev_all(fd, bufs, offset=0):
+    """
+    Writes all buffers to fd at absolute offsets starting from offset,
+    using vectored I/O with at most _IOV_MAX buffers per call and resuming
+    after short writes. The file position of fd is not used.
+    """
+    bufs = [memoryview(buf) for buf in bufs if len(buf)]
+    i = 0
+    while i < len(bufs):
+        written = os.pwritev(fd, bufs[i:i + _IOV_MAX], offset)
+        offset += written
+        # Skip fully written buffers and trim a partially written one
+        while written and written >= len(bufs[i]):
+            written -= len(bufs[i])
+            i += 1
+        if written:
+            bufs[i] = bufs[i][written:]
+
+def _write_all(bin_file, bufs):
+    """
+    Writes all buffers sequentially, for platforms without os.pwritev.
+    """
+    for buf in bufs:
+        view = memoryview(buf)
+        while view:
+            view = view[bin_file.write(view):]
+
+def _stored_member_layout(fp, info):
+    """
+    Reads the .npy header of an uncompressed member from the open archive.
+
+    Returns (offset, shape, order, dtype) of the array data in the archive,
+    or None if the member cannot be viewed in place.
+    """
+    fp.seek(info.header_offset)
+    fields = ZIP_LOCAL_HEADER.unpack(fp.read(ZIP_LOCAL_HEADER.size))
+    fp.seek(fields[-2] + fields[-1], os.SEEK_CUR)
+
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+    else:
+        return None
+
+    if dtype.hasobject:
+        return None
+    return fp.tell(), shape, 'F' if fortran_order else 'C', dtype
+
+def _read_member(zf, info):
+    """
+    Reads and decompresses one .npy member of an open .npz archive.
+    """
+    with zf.open(info) as member:
+        return np.lib.format.read_array(member, allow_pickle=False)
+
+def _load_arrays(npz_file):
+    """
+    Loads every array of an .npz file exactly once, keyed as np.load does.
+
+    Members stored without compression are views into a single read-only
+    mapping of the archive. The others are read on a small thread pool so
+    that decompressing one member (zlib releases the GIL) overlaps with
+    reading the next.
+    """
+    arrays = {}
+    mapping = None
+    with open(npz_file, 'rb') as fp, zipfile.ZipFile(npz_file) as zf, \
+            ThreadPoolExecutor(max_workers=2) as executor:
+        for info in zf.infolist():
+            key = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+
+            layout = None
+            if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                layout = _stored_member_layout(fp, info)
+            if layout is None:
+                arrays[key] = executor.submit(_read_member, zf, info)
+                continue
+
+            if mapping is None:
+                mapping = np.memmap(npz_file, dtype=np.uint8, mode='r')
+            offset, shape, order, dtype = layout
+            nbytes = prod(shape) * dtype.itemsize
+            arrays[key] = mapping[offset:offset + nbytes].view(dtype).reshape(shape, order=order)
+
+        return {key: array.result() if isinstance(array, Future) else array
+                for key, array in arrays.items()}
 
 def npz_to_binary(npz_file, binary_file):
     """
@@ -11,35 +144,24 @@ def npz_to_binary(npz_file, binary_file):
         binary_file (str): Path to the output binary file.
     """
     # Load the .npz file
-    data = np.load(npz_file)
-    metadata = []
-    current_offset = 0
-
-    with open(binary_file, 'wb') as bin_file:
-        # Write metadata header
-        bin_file.write(struct.pack('I', len(data.files)))  # Number of keys
-
-        for key in data.files:
-            array = data[key]
-            shape = array.shape
-            dtype = str(array.dtype)
-
-            # Calculate the byte offset for this key
-            metadata.append((key, shape, dtype, current_offset))
-            current_offset += array.nbytes
-
-            # Write metadata for this key
-            bin_file.write(struct.pack('I', len(key)))  # Key name length
-            bin_file.write(key.encode('utf-8'))  # Key name
-            bin_file.write(struct.pack('I', len(shape)))  # Shape length
-            bin_file.write(struct.pack('I' * len(shape), *shape))  # Shape
-            bin_file.write(struct.pack('I', len(dtype)))  # Data type length
-            bin_file.write(dtype.encode('utf-8'))  # Data type
-
-        # Write data blocks
-        for key in data.files:
-            array = data[key]
-            bin_file.write(array.tobytes())
+    arrays = _load_arrays(npz_file)
+
+    entries = []
+    payloads = []
+    for key, array in arrays.items():
+        if array.dtype not in _ALLOWED_DTYPES:
+            raise ValueError(f"Unsupported data type {array.dtype} for key '{key}'")
+        entries.append((key.encode('ascii'), array.shape, str(array.dtype).encode('ascii')))
+        # Raw bytes of the array in C order
+        payloads.append(np.ascontiguousarray(array).reshape(-1).view(np.uint8).data)
+
+    with open(binary_file, 'wb', buffering=0) as bin_file:
+        # Write metadata header followed by the data blocks
+        bufs = [_pack_header(entries)] + payloads
+        if hasattr(os, 'pwritev'):
+            _pwritev_all(bin_file.fileno(), bufs)
+        else:
+            _write_all(bin_file, bufs)
 
     print(f"Data with metadata successfully written to {binary_file}")
 
@@ -1,5 +1,34 @@
 import numpy as np
-import matplotlib.pyplot as plt
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# matplotlib's tab10 colours, repeated to fill a 256-entry palette
+_TAB10 = [
+    0x1f, 0x77, 0xb4, 0xff, 0x7f, 0x0e, 0x2c, 0xa0, 0x2c, 0xd6, 0x27, 0x28,
+    0x94, 0x67, 0xbd, 0x8c, 0x56, 0x4b, 0xe3, 0x77, 0xc2, 0x7f, 0x7f, 0x7f,
+    0xbc, 0xbd, 0x22, 0x17, 0xbe, 0xcf,
+]
+_TAB10_PALETTE = (_TAB10 * 26)[:256 * 3]
+
+def _save_png(array, path, palette=None):
+    """
+    Saves a uint8 array (H x W or H x W x 3) as a PNG file. A 2-D array
+    with a palette is saved as indexed colour.
+    """
+    image = Image.fromarray(array)
+    if palette is not None:
+        image.putpalette(palette)
+    image.save(path)
+
+def _norm(a):
+    """
+    Normalizes an array to [0, 1] as float32, allocating only the result.
+    """
+    amin = a.min()
+    out = np.subtract(a, amin, dtype=np.float32)
+    out /= (a.max() - amin) or 1.0
+    return out
 
 # Path to the .npz file
 npz_file_path = "test.npz"
@@ -7,58 +36,77 @@ npz_file_path = "test.npz"
 # Load the .npz file
 data = np.load(npz_file_path)
 
+# Read each array once
+arrays = {key: data[key] for key in data.files}
+
 # List keys and shapes of arrays
-for key in data.files:
-    print(f"Key: {key}, Shape: {data[key].shape}, Data Type: {data[key].dtype}")
+for key, array in arrays.items():
+    print(f"Key: {key}, Shape: {array.shape}, Data Type: {array.dtype}")
     
 
     
-gsd_10 = data['gsd_10']
-scl = data['scl'] 
-gsd_60 = data['gsd_60']
+gsd_10 = arrays['gsd_10']
+scl = arrays['scl'] 
+gsd_60 = arrays['gsd_60']
 
 # Normalize gsd_10 for visualization (using the first 3 channels as RGB)
-rgb_image = gsd_10[:, :, :3]  # Take the first 3 channels (R, G, B)
-rgb_image = (rgb_image - rgb_image.min()) / (rgb_image.max() - rgb_image.min())  # Normalize to [0, 1]
-rgb_image = (rgb_image * 255).astype(np.uint8)  # Convert to 8-bit
+rgb_image = _norm(gsd_10[:, :, :3])  # Take the first 3 channels (R, G, B), normalize to [0, 1]
+rgb_image *= 255
+rgb_image = rgb_image.astype(np.uint8)  # Convert to 8-bit
 
 # Normalize gsd_60 channels for grayscale visualization
-gsd_60_channel_1 = gsd_60[:, :, 0]  # First channel
-gsd_60_channel_1 = (gsd_60_channel_1 - gsd_60_channel_1.min()) / (gsd_60_channel_1.max() - gsd_60_channel_1.min())
-
-gsd_60_channel_2 = gsd_60[:, :, 1]  # Second channel
-gsd_60_channel_2 = (gsd_60_channel_2 - gsd_60_channel_2.min()) / (gsd_60_channel_2.max() - gsd_60_channel_2.min())
-
-# Create a figure with 4 subplots
-plt.figure(figsize=(16, 8))  # Adjust the figure size
-
-# First subplot: RGB image
-plt.subplot(2, 2, 1)
-plt.title("RGB Image (gsd_10)")
-plt.imshow(rgb_image)
-plt.axis("off")  # Remove axes for a cleaner display
-
-# Second subplot: SCL layer
-plt.subplot(2, 2, 2)
-plt.title("SCL Layer")
-plt.imshow(scl, cmap='tab10')  # Use a qualitative colormap
-plt.colorbar(label="SCL Classes")  # Add a colorbar for the classification
-plt.axis("off")
-
-# Third subplot: GSD_60 Channel 1
-plt.subplot(2, 2, 3)
-plt.title("GSD_60 Channel 1")
-plt.imshow(gsd_60_channel_1, cmap='gray')  # Grayscale visualization
-plt.colorbar(label="Intensity")
-plt.axis("off")
-
-# Fourth subplot: GSD_60 Channel 2
-plt.subplot(2, 2, 4)
-plt.title("GSD_60 Channel 2")
-plt.imshow(gsd_60_channel_2, cmap='gray')  # Grayscale visualization
-plt.colorbar(label="Intensity")
-plt.axis("off")
-
-# Display all plots
-plt.tight_layout()
-plt.show()
+gsd_60_channel_1 = _norm(gsd_60[:, :, 0])  # First channel
+
+gsd_60_channel_2 = _norm(gsd_60[:, :, 1])  # Second channel
+
+# Write the tiles as PNGs in parallel
+tiles = {
+    "rgb.png": (rgb_image, None),
+    "scl.png": (scl, _TAB10_PALETTE),  # Class IDs as indexed colour
+    "gsd_60_channel_1.png": ((gsd_60_channel_1 * 255).astype(np.uint8), None),
+    "gsd_60_channel_2.png": ((gsd_60_channel_2 * 255).astype(np.uint8), None),
+}
+with ThreadPoolExecutor(max_workers=4) as executor:
+    futures = {path: executor.submit(_save_png, tile, path, palette)
+               for path, (tile, palette) in tiles.items()}
+    for path, future in futures.items():
+        future.result()
+        print(f"Saved {path}")
+
+# Only build the matplotlib figure when asked to display it
+if "--show" in sys.argv[1:]:
+    import matplotlib.pyplot as plt
+
+    # Create a figure with 4 subplots
+    plt.figure(figsize=(16, 8))  # Adjust the figure size
+
+    # First subplot: RGB image
+    plt.subplot(2, 2, 1)
+    plt.title("RGB Image (gsd_10)")
+    plt.imshow(rgb_image)
+    plt.axis("off")  # Remove axes for a cleaner display
+
+    # Second subplot: SCL layer
+    plt.subplot(2, 2, 2)
+    plt.title("SCL Layer")
+    plt.imshow(scl, cmap='tab10')  # Use a qualitative colormap
+    plt.colorbar(label="SCL Classes")  # Add a colorbar for the classification
+    plt.axis("off")
+
+    # Third subplot: GSD_60 Channel 1
+    plt.subplot(2, 2, 3)
+    plt.title("GSD_60 Channel 1")
+    plt.imshow(gsd_60_channel_1, cmap='gray')  # Grayscale visualization
+    plt.colorbar(label="Intensity")
+    plt.axis("off")
+
+    # Fourth subplot: GSD_60 Channel 2
+    plt.subplot(2, 2, 4)
+    plt.title("GSD_60 Channel 2")
+    plt.imshow(gsd_60_channel_2, cmap='gray')  # Grayscale visualization
+    plt.colorbar(label="Intensity")
+    plt.axis("off")
+
+    # Display all plots
+    plt.tight_layout()
+    plt.show()